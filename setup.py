@@ -3,6 +3,16 @@ import sys, os
 
 version = '2.1'
 
+# optionally compile the request dispatching code with Cython. Set STARFLYER_CYTHON=1
+# to do so (needs Cython and a C compiler). Otherwise the pure python modules are used.
+ext_modules = []
+if os.environ.get("STARFLYER_CYTHON"):
+    from Cython.Build import cythonize
+    ext_modules = cythonize(
+        ["starflyer/app.py"],
+        compiler_directives = {'language_level' : 2},
+    )
+
 setup(name='starflyer',
       version=version,
       description="Starflyer web framework",
@@ -17,6 +27,7 @@ setup(name='starflyer',
       packages=find_packages(exclude=['ez_setup', 'examples', 'tests']),
       include_package_data=True,
       zip_safe=False,
+      ext_modules=ext_modules,
       install_requires=[
         "logbook",
         "werkzeug",
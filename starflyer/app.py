@@ -1,8 +1,4 @@
-import pkg_resources
-import urlparse
 import datetime
-import copy
-import os
 import sys
 
 import logbook
@@ -23,6 +19,48 @@ from helpers import AttributeMapper, URL, fix_types
 from templating import DispatchingJinjaLoader
 from ConfigParser import ConfigParser
 
+# cache of jinja package loaders by (import name, template folder)
+_LOADER_CACHE = {}
+
+# cache of WSGI environments without a body built by make_request() by their options
+_ENVIRON_CACHE = {}
+_ENVIRON_CACHE_SIZE = 1000
+
+class _LogInjector(object):
+    """callback for ``logbook.Processor`` injecting request data into log records.
+    The data is only read from the request once a record is actually logged.
+    """
+
+    __slots__ = ('request',)
+
+    def __init__(self, request):
+        self.request = request
+
+    def __call__(self, record):
+        """the injection callback for any log record"""
+        request = self.request
+        extra = record.extra
+        extra['url'] = request.url
+        extra['method'] = request.method
+        extra['ip'] = request.remote_addr
+        record.hid = id(request)
+        # TODO: add a hook for adding more information
+
+class _NullContext(object):
+    """a context manager doing nothing, used instead of the log contexts if
+    :meth:`Application.setup_logger` returns ``None``
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+_NULL_CONTEXT = _NullContext()
+
 class Application(object):
     """a base class for dispatching WSGI requests"""
 
@@ -36,6 +74,9 @@ class Application(object):
     # class to be used for URL Routes
     url_rule_class = werkzeug.routing.Rule
 
+    # maximum number of host/script name combinations to cache URL adapter data for
+    url_adapter_cache_size = 100
+
     # session interface
     session_interface = sessions.SecureCookieSessionInterface()
 
@@ -103,6 +144,7 @@ class Application(object):
         # initialize URL mapping variables
         self.url_map = werkzeug.routing.Map()
         self.handlers = {}
+        self._url_adapter_cache = {}
 
        
         # initialize configuration
@@ -135,9 +177,10 @@ class Application(object):
 
         # now bind all the modules to our app and create a mapping 
         # we also make sure he that URLs of modules are registered first so their namespaces work correctly
+        # (the module has to be in the mapping before binding so its url rules can be linked to it)
         for module in self.modules:
-            module.bind_to_app(self)
             self.module_map[module.name] = module
+            module.bind_to_app(self)
 
         # initialize the actual routes 
         for route in self.routes:
@@ -149,11 +192,7 @@ class Application(object):
 
         # clean up static url path
         if self.config.static_folder is not None:
-            sup = self.config.static_url_path
-            if sup.endswith("/"):
-                sup = sup[:-1] # remove any trailing slash
-            if not sup.startswith("/"):
-                sup = "/"+sup # add a leading slash if missing
+            sup = "/" + self.config.static_url_path.strip("/") # exactly one leading and no trailing slash
             self.add_url_rule(sup+ '/<path:filename>',
                             endpoint='static',
                             handler=static.StaticFileHandler)
@@ -162,6 +201,9 @@ class Application(object):
         # now call the hook for changing the setup after initialization
         self.finalize_setup()
 
+        # number of path segments to shift from PATH_INFO to SCRIPT_NAME for each request
+        self._spi = int(self.config.get("shift_path_info", 0))
+
         # for testing purposes. Set app.config.testing = True and this will be populated.
         self.last_handler = None
 
@@ -265,8 +307,13 @@ class Application(object):
         In case you want to change the loader for app templates, simply override
         this property in your subclassed app.
         """
-        if self.config.template_folder is not None:
-            return jinja2.PackageLoader(self.import_name, self.config.template_folder)
+        template_folder = self.config.template_folder
+        if template_folder is not None:
+            key = (self.import_name, template_folder)
+            loader = _LOADER_CACHE.get(key)
+            if loader is None:
+                loader = _LOADER_CACHE[key] = jinja2.PackageLoader(self.import_name, template_folder)
+            return loader
         return None
 
     @property
@@ -283,6 +330,8 @@ class Application(object):
         options = dict(self.jinja_options)
         if 'loader' not in options:
             options['loader'] = self.global_jinja_loader
+        # only check templates for changes on each render in debug mode
+        options.setdefault('auto_reload', self.config.debug)
         #if 'autoescape' not in options:
             #options['autoescape'] = self.select_jinja_autoescape
         rv = jinja2.Environment(**options)
@@ -333,22 +382,24 @@ class Application(object):
     #### CONFIGURATION related
     ####
     
-    def add_url_rule(self, url_or_path, endpoint = None, handler = None, **options):
+    def add_url_rule(self, url_or_path, endpoint = None, handler = None, defaults = None, **options):
         """add another url rule to the url map""" 
         if isinstance(url_or_path, URL):
             path = url_or_path.path
             endpoint = url_or_path.endpoint
             handler = url_or_path.handler
-            options = url_or_path.options
+            # copy the options so we don't change the URL's options
+            options = dict(url_or_path.options)
+            defaults = options.pop('defaults', None)
         else:
             path = url_or_path
         if endpoint is None:
             assert handler is not None, "handler and endpoint not provided"
             endpoint = handler.__name__
-        options['endpoint'] = endpoint
-        options['defaults'] = options.get('defaults') or None
 
-        rule = self.url_rule_class(path, **options)
+        rule = self.url_rule_class(path, endpoint = endpoint, defaults = defaults or None, **options)
+        # remember the module on the rule so we don't need to look it up per request
+        rule.module = self.get_module_for_endpoint(endpoint)
         self.url_map.add(rule)
         if handler is not None:
             self.handlers[endpoint] = handler
@@ -395,17 +446,29 @@ class Application(object):
             self.raise_routing_exception(request, e)
 
         # check if we are called from a module
-        module = None
-        endpoint = url_rule.endpoint
-        parts = endpoint.split(".")
-        if len(parts)==2:
-            module_name = parts[0]
-            module = self.module_map.get(module_name, None)
+        try:
+            module = url_rule.module
+        except AttributeError:
+            # the rule was added to the url map directly and not via add_url_rule()
+            module = self.get_module_for_endpoint(url_rule.endpoint)
 
         # try to find the right handler for this url and instantiate it
         return self.handlers[url_rule.endpoint](self, request, module = module)
 
 
+    def get_module_for_endpoint(self, endpoint):
+        """return the module an endpoint belongs to or ``None`` if it belongs
+        to the app itself.
+
+        :param endpoint: the endpoint of a url rule
+        """
+        parts = endpoint.split(".")
+        if len(parts)==2:
+            module_name = parts[0]
+            return self.module_map.get(module_name, None)
+        return None
+
+
     def process_request(self, request):
         """the main request processing. Gets a :class:`~starflyer.Request` as input and
         returns an instance of :class:`~starflyer.Response`. In case of an exception
@@ -416,25 +479,23 @@ class Application(object):
         # check if we are the first request ever for this application
         self.check_first_request(request)
 
-        # helper for injecting data into the log record
-        def inject(record):
-            """the injection callback for any log record"""
-            record.extra['url'] = request.url
-            record.extra['method'] = request.method
-            record.extra['ip'] = request.remote_addr
-            record.hid = id(request)
-            # TODO: add a hook for adding more information
-            
         # use the log context to actually call the handler
-        with self.setup_logger():
-            with logbook.Processor(inject):
+        log_setup = self.setup_logger()
+        if log_setup is None:
+            log_setup = processor = _NULL_CONTEXT
+        else:
+            processor = logbook.Processor(_LogInjector(request))
+        with log_setup:
+            with processor:
                 try:
                     # find the handler 
                     handler = self.find_handler(request)
+                    use_hooks = handler.use_hooks
+                    modules = self.modules
 
                     # run the before_handler hooks from app and modules
-                    if handler.use_hooks:
-                        for module in self.modules:
+                    if use_hooks:
+                        for module in modules:
                             rv = module.before_handler(handler)
                             if rv is not None:
                                 return rv
@@ -448,8 +509,8 @@ class Application(object):
 
                     # call the handler and receive the response
                     response = handler(**request.view_args)
-                    if handler.use_hooks:
-                        for module in self.modules:
+                    if use_hooks:
+                        for module in modules:
                             rv = module.after_handler(handler, response) # hook for post processing a resposne
                             if rv is not None:
                                 return rv
@@ -469,9 +530,10 @@ class Application(object):
     
     def __call__(self, environ, start_response):
         """do WSGI request dispatching"""
-        spi = int(self.config.get("shift_path_info", 0))
-        for i in range(0,spi):
-            shift_path_info(environ)
+        spi = self._spi
+        if spi:
+            for i in range(0, spi):
+                shift_path_info(environ)
         request = self.request_class(environ)
         try:
             response = self.process_request(request)
@@ -484,6 +546,9 @@ class Application(object):
         """override this method to define your own log handlers. Usually it
         will return a ``NestedSetup`` object to be used. 
 
+        If you return ``None`` no log handlers are pushed and log records are not
+        enriched with request data, which saves some work on each request.
+
         per default we log to stdout
         """
         format_string = '{record.channel} : {record.message} (in {record.filename}:{record.lineno}), args: {record.kwargs})'
@@ -532,9 +597,8 @@ class Application(object):
         """
         if self.config.force_exceptions:
             raise
-        if self.error_handlers and e.code in self.error_handlers:
-            handler = self.error_handlers[e.code]
-        else:
+        handler = self.error_handlers.get(e.code)
+        if handler is None:
             return e
         # a handler is a normal starflyer handler which we need to call now
         # with the request and all
@@ -549,20 +613,18 @@ class Application(object):
         function will either return a response value or reraise the
         exception with the same traceback.
         """
-        exc_type, exc_value, tb = sys.exc_info()
-        assert exc_value is e
-
-        # ensure not to trash sys.exc_info() at that point in case someone
-        # wants the traceback preserved in handle_http_exception.  Of course
-        # we cannot prevent users from trashing it themselves in a custom
-        # trap_http_exception method so that's their fault then.
         if isinstance(e, werkzeug.exceptions.HTTPException):
             return self.handle_http_exception(request, e)
 
+        # entries for status codes are only used by handle_http_exception()
         for typecheck, handler in self.error_handlers.items():
             if not isinstance(typecheck, (int, long)) and isinstance(e, typecheck):
                 return self.call_error_handler(handler, request, exception = e)
 
+        # we only need the traceback for re-raising the exception. Nothing above
+        # may trash sys.exc_info() so that the original traceback is preserved.
+        exc_type, exc_value, tb = sys.exc_info()
+        assert exc_value is e
         raise exc_type, exc_value, tb
 
     
@@ -652,8 +714,32 @@ class Application(object):
         """
         if request is not None:
             # adjust the scheme
-            request.environ['wsgi.url_scheme'] = request.environ.get('HTTP_X_URL_SCHEME', 'http') 
-            return self.url_map.bind_to_environ(request.environ)
+            environ = request.environ
+            environ['wsgi.url_scheme'] = environ.get('HTTP_X_URL_SCHEME', 'http') 
+
+            # server name, script name and subdomain only depend on these values
+            # so we only let werkzeug compute them once and reuse them afterwards
+            key = (environ.get('HTTP_HOST'),
+                   environ.get('SERVER_NAME'),
+                   environ.get('SERVER_PORT'),
+                   environ.get('SCRIPT_NAME'),
+                   environ['wsgi.url_scheme'])
+            cache = self._url_adapter_cache
+            adapter = cache.get(key)
+            if adapter is None:
+                if len(cache) >= self.url_adapter_cache_size:
+                    cache.clear()
+                adapter = cache[key] = self.url_map.bind_to_environ(environ)
+                return adapter
+            charset = self.url_map.charset
+            return werkzeug.routing.MapAdapter(self.url_map,
+                adapter.server_name,
+                adapter.script_name,
+                adapter.subdomain,
+                adapter.url_scheme,
+                environ.get('PATH_INFO', '').decode(charset, 'replace'),
+                environ['REQUEST_METHOD'],
+                environ.get('QUERY_STRING', '').decode(charset, 'replace'))
 
         # We need at the very least the server name to be set for this
         # to work.
@@ -778,8 +864,26 @@ class Application(object):
 
         :return: an instance of the request class configured for the application instance.
         """
-        builder = werkzeug.test.EnvironBuilder(**options)
-        env = builder.get_environ()
+        try:
+            key = tuple(sorted(options.items()))
+            env = _ENVIRON_CACHE.get(key)
+        except TypeError:
+            # unhashable options like form data dicts or header lists are not cached
+            key = env = None
+
+        if env is None:
+            builder = werkzeug.test.EnvironBuilder(**options)
+            env = builder.get_environ()
+            # only cache environments with an empty input stream as others get consumed
+            if key is not None and env['CONTENT_LENGTH'] == '0':
+                if len(_ENVIRON_CACHE) >= _ENVIRON_CACHE_SIZE:
+                    _ENVIRON_CACHE.clear()
+                _ENVIRON_CACHE[key] = env
+                env = dict(env)
+        else:
+            env = dict(env)
+            if 'errors_stream' not in options:
+                env['wsgi.errors'] = sys.stderr
         return self.request_class(env)
 
     def run_request(self, **options):
@@ -75,8 +75,8 @@ class asjson(object):
                 s = json.dumps(data, default = jsonconverter)
             else:
                 s = json.dumps(data, cls = that.cls)
-            if self.request.args.has_key("callback"):
-                callback = self.request.args.get("callback")
+            callback = self.request.args.get("callback")
+            if callback is not None:
                 s = "%s(%s)" %(callback, s)
                 response.data = s
                 response.content_type = "application/javascript"
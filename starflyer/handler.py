@@ -1,5 +1,4 @@
 import os
-import copy
 import json
 import werkzeug.exceptions
 import exceptions
@@ -78,9 +78,10 @@ class AttributeMapper(dict):
 
     def __getattr__(self, k):
         """retrieve some data from the dict"""
-        if self.has_key(k):
+        try:
             return self[k]
-        raise AttributeError(k)
+        except KeyError:
+            raise AttributeError(k)
 
     def __setattr__(self, k,v):
         """store an attribute in the map"""
@@ -128,6 +129,8 @@ class AttributeMapper(dict):
 class URL(object):
     """proxy object for a URL rule in order to be used more easily in route listings"""
 
+    __slots__ = ['path', 'endpoint', 'handler', 'options']
+
     def __init__(self, path, endpoint = None, handler = None, **options):
         """initialize the route url basically with what we need for werkzeug routes
 
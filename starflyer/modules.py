@@ -125,8 +125,8 @@ class Module(object):
         # these need to be stored in the modules sub dictionary with the module names as keys.
         # e.g. if you want to configure the mail module you'd set
         # 'modules' : {'mail' : {'debug' : False}}
-        if app.config.has_key("modules"):
-            modcfg = app.config['modules']
+        modcfg = app.config.get("modules")
+        if modcfg is not None:
             self.config.update(fix_types(modcfg.get(self.name, {}), self.config_types))
 
         self.finalize()
@@ -225,12 +225,15 @@ class SecureCookieSessionInterface(SessionInterface):
 
     def save_session(self, app, session, response):
         """save a session"""
+        if not session.modified:
+            # nothing to store or delete, the cookie would not be set anyway
+            return
         expires = self.get_expiration_time(app, session)
         domain = self.get_cookie_domain(app)
         path = self.get_cookie_path(app)
         httponly = self.get_cookie_httponly(app)
         secure = self.get_cookie_secure(app)
-        if session.modified and not session:
+        if not session:
             response.delete_cookie(app.config.session_cookie_name, path=path,
                                    domain=domain)
         else:
@@ -40,3 +40,61 @@ def test_strict_slashes(client):
 
     resp = client.get("/branch/")
     assert resp.status_code == 200
+
+def test_rule_added_to_url_map(client):
+    """rules added directly to the werkzeug url map use the handler of their endpoint"""
+    import werkzeug.routing
+    app = client.application
+    app.url_map.add(werkzeug.routing.Rule("/direct", endpoint="huhu"))
+
+    resp = client.get("/direct")
+    assert resp.status=="200 OK"
+    assert resp.data == "test2"
+
+def test_handler_replaced(client):
+    """replacing a handler after initialization is used for the next request"""
+    app = client.application
+    app.handlers['index'] = app.handlers['huhu']
+
+    resp = client.get('/')
+    assert resp.status=="200 OK"
+    assert resp.data == "test2"
+
+def test_url_adapter_cache(client):
+    """url adapters are cached per host but must still match the actual path and query"""
+    app = client.application
+
+    urls = app.create_url_adapter(app.make_request(path="/post/1"))
+    assert urls.match() == ("post", {'id' : '1'})
+
+    # same host, so the cached server data is reused
+    urls = app.create_url_adapter(app.make_request(path="/post/2", query_string="a=b"))
+    assert urls.match() == ("post", {'id' : '2'})
+    assert urls.query_args == "a=b"
+    assert urls.build("huhu", force_external=True) == "http://localhost/huhu"
+    assert len(app._url_adapter_cache) == 1
+
+    # another host and script name gets its own entry
+    request = app.make_request(path="/huhu", base_url="http://example.com:8080/sub/")
+    urls = app.create_url_adapter(request)
+    assert urls.match() == ("huhu", {})
+    assert urls.build("huhu", force_external=True) == "http://example.com:8080/sub/huhu"
+    assert len(app._url_adapter_cache) == 2
+
+    urls = app.create_url_adapter(app.make_request(path="/huhu"))
+    assert urls.build("huhu", force_external=True) == "http://localhost/huhu"
+
+def test_make_request_cache(client):
+    """requests created from cached environments do not share any state"""
+    app = client.application
+
+    r1 = app.make_request(path="/", query_string="a=1")
+    r2 = app.make_request(path="/", query_string="a=2")
+    assert r1.args['a'] == "1"
+    assert r2.args['a'] == "2"
+
+    r1.environ['HTTP_X_TEST'] = "foo"
+    r3 = app.make_request(path="/", query_string="a=1")
+    assert r3.args['a'] == "1"
+    assert r3.environ is not r1.environ
+    assert "HTTP_X_TEST" not in r3.environ
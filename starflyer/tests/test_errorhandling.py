@@ -53,3 +53,24 @@ def test_strict_slashes_no_debug(client):
     assert resp.headers['location'] == "http://localhost/branch/"
 
 
+
+def test_exception_handler_replaced(client):
+    """check that a handler for an exception class can be replaced at runtime"""
+    from starflyer import Handler
+
+    class NameErrorHandler1(Handler):
+        def get(self, exception=None):
+            return "handler 1"
+
+    class NameErrorHandler2(Handler):
+        def get(self, exception=None):
+            return "handler 2"
+
+    app = client.application
+    app.error_handlers = {NameError: NameErrorHandler1}
+    resp = client.get("/broken")
+    assert resp.data == "handler 1"
+
+    app.error_handlers[NameError] = NameErrorHandler2
+    resp = client.get("/broken")
+    assert resp.data == "handler 2"
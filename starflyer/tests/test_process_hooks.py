@@ -15,3 +15,35 @@ def test_before_and_after(client):
     resp = client.get('/')
     assert resp.headers['X-After'] == 'foobar'
 
+
+def test_log_record_request_data(client):
+    import logbook
+    app = client.application
+    log_handler = logbook.TestHandler()
+    app.setup_logger = lambda: log_handler
+
+    # request data is only read once something gets logged
+    request = app.make_request(path = '/')
+    app.process_request(request)
+    assert 'url' not in request.__dict__
+
+    app.before_handler = lambda handler: logbook.Logger("test").info("before")
+    request = app.make_request(path = '/')
+    app.process_request(request)
+    record = log_handler.records[0]
+    assert record.extra['url'] == "http://localhost/"
+    assert record.extra['method'] == "GET"
+    assert record.hid == id(request)
+
+def test_no_logger(client):
+    import logbook
+    app = client.application
+    app.setup_logger = lambda: None
+
+    processors = []
+    app.before_handler = lambda handler: processors.extend(
+        logbook.Processor.stack_manager.iter_context_objects())
+    resp = app.run_request(path = '/')
+    assert resp.data == "test1"
+    assert resp.headers['X-After'] == 'foobar'
+    assert processors == []